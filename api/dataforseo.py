@@ -1,35 +1,71 @@
 import base64
+import random
+import threading
 import time
-from typing import Dict, Optional, Callable
+from concurrent.futures import Future
+from typing import Dict, Optional, Callable, Tuple
+import orjson
 import requests
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from requests.adapters import HTTPAdapter
+from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception_type
 
 DEFAULT_BASE = "https://api.dataforseo.com/v3"
 DEFAULT_TIMEOUT = (10, 60)  # (connect, read)
+MAX_POLL_SLEEP = 8.0
+POOL_SIZE = 8  # concurrent connections to the API host; the app shares one client across sessions
+PRODUCTS_POST = "/merchant/google/products/task_post"
+PRODUCTS_GET_FMT = "/merchant/google/products/task_get/advanced/{}"
 
 class DataForSEOError(Exception):
     pass
 
+class _SearchInterrupted(Exception):
+    """Set on a shared search whose leader was interrupted; waiters retry instead of failing."""
+
+# In-flight searches keyed by request, so concurrent identical searches share one task.
+_inflight: Dict[Tuple, Future] = {}
+_inflight_lock = threading.Lock()
+
+def _auth_headers(login: str, password: str) -> Dict[str, str]:
+    if not login or not password:
+        raise ValueError("Missing DataForSEO credentials.")
+    creds = f"{login}:{password}"
+    encoded = base64.b64encode(creds.encode()).decode()
+    return {
+        "Authorization": f"Basic {encoded}",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "User-Agent": "shopping-api-tester/2.0"
+    }
+
+def _poll_delay(attempt: int, poll_every: float, remaining: float) -> float:
+    """Full-jitter backoff: sleep uniformly in [0, min(cap, poll_every * 2**attempt)]."""
+    cap = min(remaining, MAX_POLL_SLEEP, poll_every * 2 ** min(attempt, 8))
+    return random.uniform(0, max(0.0, cap))
+
+def _products_task(keyword: str, location_code: int, language_code: str, depth: int) -> Dict:
+    return {
+        "keyword": keyword,
+        "location_code": location_code,
+        "language_code": language_code,
+        "depth": max(10, min(depth, 100))
+    }
+
 class DataForSEOClient:
     """Minimal client for DataForSEO Google Shopping API."""
 
     def __init__(self, login: str, password: str, base_url: str = DEFAULT_BASE):
-        if not login or not password:
-            raise ValueError("Missing DataForSEO credentials.")
         self.base_url = base_url.rstrip("/")
-        creds = f"{login}:{password}"
-        encoded = base64.b64encode(creds.encode()).decode()
-        self.headers = {
-            "Authorization": f"Basic {encoded}",
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "User-Agent": "shopping-api-tester/2.0"
-        }
+        self.headers = _auth_headers(login, password)
         self.session = requests.Session()
+        # Retries are handled by tenacity, so the adapter itself never retries.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
     @retry(
-        retry=retry_if_exception_type((requests.RequestException, DataForSEOError)),
-        wait=wait_exponential(multiplier=1, min=1, max=8),
+        retry=retry_if_exception_type((requests.RequestException, orjson.JSONDecodeError, DataForSEOError)),
+        wait=wait_random_exponential(multiplier=1, max=8),
         stop=stop_after_attempt(5),
         reraise=True,
     )
@@ -37,14 +73,14 @@ class DataForSEOClient:
         url = f"{self.base_url}{path}"
         r = self.session.post(url, headers=self.headers, json=payload, timeout=DEFAULT_TIMEOUT)
         r.raise_for_status()
-        data = r.json()
+        data = orjson.loads(r.content)
         if data.get("status_code") not in (20000, 20100, 40500):
             raise DataForSEOError(f"API status: {data.get('status_code')} {data.get('status_message')}")
         return data
 
     @retry(
-        retry=retry_if_exception_type((requests.RequestException, DataForSEOError)),
-        wait=wait_exponential(multiplier=1, min=1, max=8),
+        retry=retry_if_exception_type((requests.RequestException, orjson.JSONDecodeError, DataForSEOError)),
+        wait=wait_random_exponential(multiplier=1, max=8),
         stop=stop_after_attempt(7),
         reraise=True,
     )
@@ -52,7 +88,7 @@ class DataForSEOClient:
         url = f"{self.base_url}{path}"
         r = self.session.get(url, headers=self.headers, timeout=DEFAULT_TIMEOUT)
         r.raise_for_status()
-        data = r.json()
+        data = orjson.loads(r.content)
         if data.get("status_code") not in (20000,):
             raise DataForSEOError(f"API status: {data.get('status_code')} {data.get('status_message')}")
         return data
@@ -66,6 +102,7 @@ class DataForSEOClient:
     ) -> Dict:
         start = time.time()
         last = {}
+        attempt = 0
         while True:
             last = self._get(get_path)
             tasks = last.get("tasks") or []
@@ -76,7 +113,8 @@ class DataForSEOClient:
                 on_tick(elapsed, int(max_wait_sec))
             if elapsed >= max_wait_sec:
                 raise DataForSEOError("Timed out waiting for task result.")
-            time.sleep(poll_every)
+            time.sleep(_poll_delay(attempt, poll_every, max_wait_sec - elapsed))
+            attempt += 1
 
     def search_products(
         self,
@@ -86,15 +124,35 @@ class DataForSEOClient:
         depth: int = 100,
         on_tick: Optional[Callable[[int, int], None]] = None
     ) -> Dict:
-        payload = [{
-            "keyword": keyword,
-            "location_code": location_code,
-            "language_code": language_code,
-            "depth": max(10, min(depth, 100))
-        }]
-        post = self._post("/merchant/google/products/task_post", payload)
-        task_id = post["tasks"][0]["id"]
-        return self._wait_for_result(f"/merchant/google/products/task_get/advanced/{task_id}", on_tick=on_tick)
+        task = _products_task(keyword, location_code, language_code, depth)
+        key = (self.base_url, keyword, location_code, language_code, task["depth"])
+        while True:
+            with _inflight_lock:
+                fut = _inflight.get(key)
+                leader = fut is None
+                if leader:
+                    fut = _inflight[key] = Future()
+            if leader:
+                break
+            try:
+                return fut.result()
+            except _SearchInterrupted:
+                continue  # the leader's script was interrupted; run the search ourselves
+        try:
+            post = self._post(PRODUCTS_POST, [task])
+            task_id = post["tasks"][0]["id"]
+            result = self._wait_for_result(PRODUCTS_GET_FMT.format(task_id), on_tick=on_tick)
+        except BaseException as e:
+            # Unregister before waking waiters so a retrying waiter can become the new leader.
+            with _inflight_lock:
+                _inflight.pop(key, None)
+            # Control-flow exceptions (e.g. Streamlit reruns) must not fail other callers.
+            fut.set_exception(e if isinstance(e, Exception) else _SearchInterrupted())
+            raise
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        fut.set_result(result)
+        return result
 
     def get_product_info(
         self,
@@ -0,0 +1,168 @@
+import asyncio
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Callable, Tuple, Union
+import httpx
+import orjson
+from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception_type
+from .dataforseo import (
+    DEFAULT_BASE, PRODUCTS_POST, PRODUCTS_GET_FMT, DataForSEOError,
+    _auth_headers, _poll_delay, _products_task,
+)
+
+DEFAULT_TIMEOUT = httpx.Timeout(60, connect=10)
+DEFAULT_LIMITS = httpx.Limits(max_connections=20)
+MAX_TASKS_PER_POST = 100
+# Over the last quarter of max_wait_sec pending tasks are also fetched directly, since
+# tasks_ready only lists a limited backlog of uncollected tasks per account.
+FALLBACK_WINDOW = 0.25
+
+def _ready_path(get_path_fmt: str) -> str:
+    return get_path_fmt.split("/task_get/")[0] + "/tasks_ready"
+
+def _ready_ids(ready: Dict) -> set:
+    return {r.get("id") for t in ready.get("tasks") or [] for r in t.get("result") or []}
+
+def _has_result(data: Dict) -> bool:
+    tasks = data.get("tasks") or []
+    return bool(tasks and tasks[0].get("result"))
+
+class AsyncDataForSEOClient:
+    """Async DataForSEO client for running many searches concurrently."""
+
+    def __init__(self, login: str, password: str, base_url: str = DEFAULT_BASE):
+        self.base_url = base_url.rstrip("/")
+        self.headers = _auth_headers(login, password)
+        self.client = httpx.AsyncClient(
+            http2=True,
+            headers=self.headers,
+            limits=DEFAULT_LIMITS,
+            timeout=DEFAULT_TIMEOUT,
+        )
+
+    async def __aenter__(self) -> "AsyncDataForSEOClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    @retry(
+        retry=retry_if_exception_type((httpx.HTTPError, orjson.JSONDecodeError, DataForSEOError)),
+        wait=wait_random_exponential(multiplier=1, max=8),
+        stop=stop_after_attempt(5),
+        reraise=True,
+    )
+    async def _post(self, path: str, payload) -> Dict:
+        r = await self.client.post(f"{self.base_url}{path}", json=payload)
+        r.raise_for_status()
+        data = orjson.loads(r.content)
+        if data.get("status_code") not in (20000, 20100, 40500):
+            raise DataForSEOError(f"API status: {data.get('status_code')} {data.get('status_message')}")
+        return data
+
+    @retry(
+        retry=retry_if_exception_type((httpx.HTTPError, orjson.JSONDecodeError, DataForSEOError)),
+        wait=wait_random_exponential(multiplier=1, max=8),
+        stop=stop_after_attempt(7),
+        reraise=True,
+    )
+    async def _get(self, path: str) -> Dict:
+        r = await self.client.get(f"{self.base_url}{path}")
+        r.raise_for_status()
+        data = orjson.loads(r.content)
+        if data.get("status_code") not in (20000,):
+            raise DataForSEOError(f"API status: {data.get('status_code')} {data.get('status_message')}")
+        return data
+
+    async def _wait_for_many(
+        self,
+        task_ids: Iterable[str],
+        get_path_fmt: str,
+        max_wait_sec: int = 180,
+        poll_every: float = 2.0,
+        on_tick: Optional[Callable[[int, int], None]] = None,
+    ) -> AsyncIterator[Tuple[str, Union[Dict, Exception]]]:
+        """Poll tasks_ready once per tick and fetch newly ready tasks concurrently.
+
+        Yields (task_id, response) as tasks complete. A task whose fetch fails, or
+        that is still pending at the deadline, is yielded with the exception instead.
+        """
+        ready_path = _ready_path(get_path_fmt)
+        pending = set(task_ids)
+        start = time.time()
+        attempt = 0
+        while pending:
+            fallback = time.time() - start >= max_wait_sec * (1 - FALLBACK_WINDOW)
+            try:
+                ready = pending & _ready_ids(await self._get(ready_path))
+            except Exception:
+                ready, fallback = set(), True
+            check = list(pending if fallback else ready)
+            results = await asyncio.gather(*[self._get(get_path_fmt.format(t)) for t in check], return_exceptions=True)
+            for task_id, data in zip(check, results):
+                if isinstance(data, BaseException) and not isinstance(data, Exception):
+                    raise data
+                if isinstance(data, Exception) or task_id in ready or _has_result(data):
+                    attempt = 0
+                    pending.discard(task_id)
+                    yield task_id, data
+            if not pending:
+                return
+            elapsed = int(time.time() - start)
+            if on_tick:
+                on_tick(elapsed, int(max_wait_sec))
+            if elapsed >= max_wait_sec:
+                for task_id in pending:
+                    yield task_id, DataForSEOError("Timed out waiting for task result.")
+                return
+            await asyncio.sleep(_poll_delay(attempt, poll_every, max_wait_sec - elapsed))
+            attempt += 1
+
+    async def search_products_many(
+        self,
+        keywords: List[str],
+        location_code: int = 2826,
+        language_code: str = "en",
+        depth: int = 100,
+        on_tick: Optional[Callable[[int, int], None]] = None
+    ) -> AsyncIterator[Tuple[str, Union[Dict, Exception]]]:
+        """Post all (unique) keywords up front, then yield (keyword, response) in completion order.
+
+        Failures are isolated per keyword: a keyword whose post or fetch fails is
+        yielded with the exception, and tasks DataForSEO refuses at post time are
+        yielded as ``{"tasks": [task]}`` so callers can surface the status message.
+        """
+        chunks = [keywords[i:i + MAX_TASKS_PER_POST] for i in range(0, len(keywords), MAX_TASKS_PER_POST)]
+        # Each task is tagged with its index in the chunk: the echoed keyword may be
+        # normalised by the API, and tasks aren't guaranteed to come back in post order.
+        posts = await asyncio.gather(*[
+            self._post(PRODUCTS_POST, [
+                {**_products_task(k, location_code, language_code, depth), "tag": str(i)}
+                for i, k in enumerate(chunk)
+            ])
+            for chunk in chunks
+        ], return_exceptions=True)
+        by_id = {}
+        for chunk, post in zip(chunks, posts):
+            if isinstance(post, BaseException) and not isinstance(post, Exception):
+                raise post
+            if isinstance(post, Exception):
+                for k in chunk:
+                    yield k, post
+                continue
+            unmatched = dict(enumerate(chunk))
+            for task in post.get("tasks") or []:
+                tag = (task.get("data") or {}).get("tag")
+                k = unmatched.pop(int(tag), None) if str(tag).isdigit() else None
+                if k is None:
+                    continue
+                if task.get("status_code") == 20100:
+                    by_id[task["id"]] = k
+                else:
+                    yield k, {"tasks": [task]}
+            for k in unmatched.values():
+                yield k, DataForSEOError("No task was created for this keyword.")
+        async for task_id, data in self._wait_for_many(by_id, PRODUCTS_GET_FMT, on_tick=on_tick):
+            yield by_id[task_id], data
@@ -1,9 +1,13 @@
-import os, io, time, sqlite3
+import os, io, time, random, sqlite3, asyncio, threading
+from collections import OrderedDict
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import streamlit as st
 from dotenv import load_dotenv
 from api.dataforseo import DataForSEOClient, DataForSEOError
-from utils.analysis import parse_shopping_results, analyze_competitors, calculate_title_quality_score
+from api.dataforseo_async import AsyncDataForSEOClient
+from utils.analysis import parse_shopping_results, analyze_competitors
 
 load_dotenv()
 
@@ -19,8 +23,13 @@ if not login or not password:
     st.sidebar.error("Add DATAFORSEO_LOGIN and DATAFORSEO_PASSWORD to secrets or .env")
     st.stop()
 
+# One client per process, so its pooled keep-alive connections survive reruns.
+@st.cache_resource
+def get_client(login: str, password: str) -> DataForSEOClient:
+    return DataForSEOClient(login, password)
+
 try:
-    client = DataForSEOClient(login, password)
+    client = get_client(login, password)
     st.sidebar.success("API client ready")
 except Exception as e:
     st.sidebar.error(f"Init failed: {e}")
@@ -42,7 +51,55 @@ target_domains = [x.strip() for x in competitor_domains.splitlines() if x.strip(
 
 uploaded = st.file_uploader("Upload CSV with 'keyword' column (optional)", type=["csv"])
 
-def search_with_progress(k: str, loc: int, dep: int):
+SEARCH_TTL = (3000, 4200)  # seconds; drawn per entry so entries don't all expire together
+SEARCH_MAX_AGE = 7200  # past this an entry is refetched synchronously instead of served stale
+SEARCH_MAX_ENTRIES = 64
+
+# Raw payloads live in a process-wide LRU store and are served by reference (read-only
+# downstream). Once an entry expires it is still returned while a background thread
+# refreshes it (stale-while-revalidate), up to SEARCH_MAX_AGE.
+@st.cache_resource
+def search_store():
+    return {"entries": OrderedDict(), "lock": threading.Lock()}
+
+def store_search(store, key, entry):
+    with store["lock"]:
+        store["entries"][key] = entry
+        store["entries"].move_to_end(key)
+        while len(store["entries"]) > SEARCH_MAX_ENTRIES:
+            store["entries"].popitem(last=False)
+
+def refresh_search(store, key):
+    k, loc, dep = key
+    try:
+        data = client.search_products(keyword=k, location_code=loc, depth=dep)
+        entry = (data, time.time(), time.time() + random.uniform(*SEARCH_TTL))
+    except Exception:
+        with store["lock"]:
+            hit = store["entries"].get(key)
+        if hit is None:
+            return
+        entry = (hit[0], hit[1], time.time() + 60)  # keep serving stale, retry in a minute
+    store_search(store, key, entry)
+
+def fetch_search(k: str, loc: int, dep: int):
+    store = search_store()
+    key = (k, loc, dep)
+    now = time.time()
+    with store["lock"]:
+        hit = store["entries"].get(key)
+        if hit is not None and now - hit[1] > SEARCH_MAX_AGE:
+            hit = None
+        stale = hit is not None and now > hit[2]
+        if hit is not None:
+            store["entries"].move_to_end(key)
+        if stale:
+            # Push the expiry out so only one refresh runs at a time.
+            store["entries"][key] = (hit[0], hit[1], float("inf"))
+    if stale:
+        threading.Thread(target=refresh_search, args=(store, key), daemon=True).start()
+    if hit is not None:
+        return hit[0], hit[1]
     prog = st.progress(0); status = st.empty()
     def on_tick(elapsed, maximum):
         pct = min(99, int((elapsed / max(1, maximum)) * 100))
@@ -50,8 +107,55 @@ def search_with_progress(k: str, loc: int, dep: int):
         status.info(f"Polling DataForSEO… {elapsed}s / {maximum}s")
     data = client.search_products(keyword=k, location_code=loc, depth=dep, on_tick=on_tick)
     prog.progress(100); status.success("Results received")
-    df = parse_shopping_results(data)
-    return data, df
+    fetched_at = time.time()
+    store_search(store, key, (data, fetched_at, fetched_at + random.uniform(*SEARCH_TTL)))
+    return data, fetched_at
+
+@st.cache_data(max_entries=SEARCH_MAX_ENTRIES, show_spinner=False)
+def parse_search(_raw, k: str, loc: int, dep: int, fetched_at: float):
+    return parse_shopping_results(_raw)
+
+def search_with_progress(k: str, loc: int, dep: int):
+    data, fetched_at = fetch_search(k, loc, dep)
+    return data, parse_search(data, k, loc, dep, fetched_at)
+
+@st.cache_resource
+def history_conn():
+    os.makedirs("data", exist_ok=True)
+    conn = sqlite3.connect("data/history.db", check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS results(
+        ts INTEGER, keyword TEXT, position INT, title TEXT, domain TEXT, price REAL, currency TEXT, url TEXT
+    )""")
+    return conn
+
+async def gather_searches(keywords, loc: int, dep: int):
+    boxes = {k: st.status(k, state="running") for k in keywords}
+    pending = set(keywords)
+    def on_tick(elapsed, maximum):
+        for k in pending:
+            boxes[k].update(label=f"{k} — polling {elapsed}s / {maximum}s")
+    async with AsyncDataForSEOClient(login, password) as aclient:
+        try:
+            async for k, data in aclient.search_products_many(keywords, location_code=loc, depth=dep, on_tick=on_tick):
+                pending.discard(k)
+                box = boxes[k]
+                if isinstance(data, Exception):
+                    box.update(label=f"{k} — failed", state="error")
+                    box.error(str(data))
+                    continue
+                dfk = parse_shopping_results(data)
+                if dfk.empty:
+                    box.update(label=f"{k} — no results", state="error")
+                    box.json(data)
+                else:
+                    box.update(label=f"{k} — {len(dfk)} products", state="complete")
+                    box.dataframe(dfk, use_container_width=True)
+        except Exception as e:
+            for k in pending:
+                boxes[k].update(label=f"{k} — failed", state="error")
+                boxes[k].error(str(e))
 
 if st.button("🔍 Search Products", type="primary"):
     if not keyword and not uploaded:
@@ -69,13 +173,120 @@ if st.button("🔍 Search Products", type="primary"):
             st.success(f"Found {len(df)} products.")
     if uploaded:
         bulk = pd.read_csv(uploaded)
-        for k in bulk["keyword"].dropna().astype(str).tolist():
-            st.subheader(k)
-            raw, dfk = search_with_progress(k, location_code, depth)
-            st.dataframe(dfk, use_container_width=True)
+        keywords = list(dict.fromkeys(bulk["keyword"].dropna().astype(str)))
+        asyncio.run(gather_searches(keywords, location_code, depth))
+
+# Each tab is a fragment, so its widgets rerun only that tab.
+@st.fragment
+def overview_tab(df, analysis):
+    st.subheader("Top 10 Products")
+    st.dataframe(df[["position", "title", "domain", "price", "images_count", "has_description", "has_highlights"]].head(10), use_container_width=True)
+
+    st.subheader("Domain Frequency")
+    freq = pd.DataFrame.from_dict(analysis["domain_frequency"], orient="index", columns=["count"]).head(10)
+    st.bar_chart(freq)
+
+@st.fragment
+def domains_tab(df):
+    st.subheader("Domain stats")
+    stats = df.groupby("domain").agg(
+        Appearances=("position", "count"),
+        Avg_Position=("position", "mean"),
+        Best_Position=("position", "min"),
+        Avg_Price=("price", "mean"),
+        Avg_Rating=("rating", "mean"),
+    ).round(2).sort_values("Appearances", ascending=False)
+    st.dataframe(stats, use_container_width=True)
+
+@st.fragment
+def targets_tab(analysis, target_domains):
+    if target_domains and "target_domains" in analysis:
+        for dom, s in analysis["target_domains"].items():
+            with st.expander(dom):
+                c1, c2, c3 = st.columns(3)
+                c1.metric("Appearances", s["appearances"])
+                if s["avg_position"] is not None:
+                    c2.metric("Avg Position", f"{s['avg_position']:.1f}")
+                if s["best_position"] is not None:
+                    c3.metric("Best Position", s["best_position"])
+                if s["products"]:
+                    sub = pd.DataFrame(s["products"])[["position", "title", "price", "url"]]
+                    st.dataframe(sub, use_container_width=True)
+    else:
+        st.info("Add target domains to see details.")
+
+@st.fragment
+def data_tab(df, keyword):
+    st.dataframe(df, use_container_width=True)
+    buf = io.BytesIO()
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buf)
+    st.download_button("Download CSV", buf.getvalue(), file_name=f"shopping_results_{keyword}.csv", mime="text/csv")
+
+@st.fragment
+def drilldown_tab(df):
+    st.subheader("Inspect a product")
+    if df.empty:
+        st.info("Run a search first.")
+    else:
+        pos = df["position"].astype("Int64").astype("string").fillna("-")
+        labels = ("[" + pos + "] " + df["title"].fillna("")).tolist()
+        idx = st.selectbox("Pick a product", options=range(len(labels)), format_func=labels.__getitem__)
+        pid = df.iloc[idx]["product_id"]
+
+        p2 = st.progress(0); s2 = st.empty()
+        def tick2(el, mx):
+            pct = min(99, int((el/max(1,mx))*100)); p2.progress(pct); s2.info(f"Fetching details… {el}s / {mx}s")
+
+        try:
+            details = client.get_product_info(pid, on_tick=tick2)
+            p2.progress(100); s2.success("Details received")
+        except Exception as e:
+            s2.error(f"Detail fetch failed: {e}")
+            details = None
+
+        def _extract_details(d):
+            items = (((d or {}).get("tasks") or [{}])[0].get("result") or [{}])[0].get("items") or []
+            return items[0] if items else {}
+        item = _extract_details(details)
+
+        show_desc = st.toggle("Show product description", value=False)
+        show_high = st.toggle("Show product highlights/features", value=False)
+        max_imgs = st.slider("Show up to N images", min_value=0, max_value=10, value=4)
+
+        left, right = st.columns([2,1])
+        with left:
+            st.write("Title:", item.get("title") or df.iloc[idx]["title"])
+            st.write("Seller/Domain:", item.get("seller") or item.get("domain") or df.iloc[idx]["domain"])
+            st.write("Price:", item.get("price") or df.iloc[idx]["price"])
+            st.write("Currency:", item.get("currency") or df.iloc[idx]["currency"])
+            st.write("Rating:", (item.get("product_rating") or {}).get("value"))
+            st.write("Reviews:", (item.get("product_rating") or {}).get("votes_count") or item.get("reviews_count"))
+
+        with right:
+            imgs = item.get("product_images") or item.get("images") or []
+            if max_imgs and imgs:
+                st.image(imgs[:max_imgs], use_column_width=True)
+
+        if show_desc:
+            st.markdown("### Description")
+            st.write(item.get("description") or item.get("product_description") or "—")
+
+        if show_high:
+            st.markdown("### Highlights / Features")
+            feats = item.get("product_highlights") or item.get("highlights") or item.get("features") or []
+            if isinstance(feats, dict):
+                feats = [f"{k}: {v}" for k,v in feats.items()]
+            if feats:
+                for f in feats:
+                    st.write("•", f)
+            else:
+                st.write("—")
+
+        st.markdown("### Raw details (debug)")
+        st.json(details or {})
 
 if "results_df" in st.session_state:
-    df = st.session_state.results_df.copy()
+    df = st.session_state.results_df
     analysis = st.session_state.analysis
 
     st.markdown("---")
@@ -92,122 +303,25 @@ if "results_df" in st.session_state:
 
     save_results = st.checkbox("Save these results to local history (SQLite)", value=False)
     if save_results and not df.empty:
-        os.makedirs("data", exist_ok=True)
-        conn = sqlite3.connect("data/history.db")
-        cur = conn.cursor()
-        cur.execute("""CREATE TABLE IF NOT EXISTS results(
-            ts INTEGER, keyword TEXT, position INT, title TEXT, domain TEXT, price REAL, currency TEXT, url TEXT
-        )""")
-        rows = [
-            (int(time.time()), st.session_state.keyword, int(r.get("position") or 0),
-             str(r.get("title") or ""), str(r.get("domain") or ""), float(r["price"]) if pd.notna(r.get("price")) else None,
-             str(r.get("currency") or ""), str(r.get("url") or ""))
-            for r in df.to_dict("records")
-        ]
-        cur.executemany("INSERT INTO results VALUES(?,?,?,?,?,?,?,?)", rows)
-        conn.commit(); conn.close()
+        rows = (
+            df[["position", "title", "domain", "price", "currency", "url"]]
+            .fillna({"position": 0, "title": "", "domain": "", "currency": "", "url": ""})
+            .astype({"position": int})
+            .assign(ts=int(time.time()), keyword=st.session_state.keyword)
+        )
+        # 8 columns x 100 rows stays under SQLite's bound-parameter limit on older builds.
+        rows.to_sql("results", history_conn(), if_exists="append", index=False, method="multi", chunksize=100)
         st.success("Saved to data/history.db")
 
     tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Overview", "🏆 Top Domains", "🎯 Targets", "📋 Full Data", "🔎 Drill-down"])
 
     with tab1:
-        st.subheader("Top 10 Products")
-        st.dataframe(df[["position", "title", "domain", "price", "images_count", "has_description", "has_highlights"]].head(10), use_container_width=True)
-
-        st.subheader("Domain Frequency")
-        freq = pd.DataFrame.from_dict(analysis["domain_frequency"], orient="index", columns=["count"]).head(10)
-        st.bar_chart(freq)
-
+        overview_tab(df, analysis)
     with tab2:
-        st.subheader("Domain stats")
-        stats = df.groupby("domain").agg(
-            Appearances=("position", "count"),
-            Avg_Position=("position", "mean"),
-            Best_Position=("position", "min"),
-            Avg_Price=("price", "mean"),
-            Avg_Rating=("rating", "mean"),
-        ).round(2).sort_values("Appearances", ascending=False)
-        st.dataframe(stats, use_container_width=True)
-
+        domains_tab(df)
     with tab3:
-        if target_domains and "target_domains" in analysis:
-            for dom, s in analysis["target_domains"].items():
-                with st.expander(dom):
-                    c1, c2, c3 = st.columns(3)
-                    c1.metric("Appearances", s["appearances"])
-                    if s["avg_position"] is not None:
-                        c2.metric("Avg Position", f"{s['avg_position']:.1f}")
-                    if s["best_position"] is not None:
-                        c3.metric("Best Position", s["best_position"])
-                    if s["products"]:
-                        sub = pd.DataFrame(s["products"])[["position", "title", "price", "url"]]
-                        st.dataframe(sub, use_container_width=True)
-        else:
-            st.info("Add target domains to see details.")
-
+        targets_tab(analysis, target_domains)
     with tab4:
-        df["title_quality"] = df["title"].apply(calculate_title_quality_score)
-        st.dataframe(df, use_container_width=True)
-        st.download_button("Download CSV", df.to_csv(index=False), file_name=f"shopping_results_{st.session_state.keyword}.csv", mime="text/csv")
-
+        data_tab(df, st.session_state.keyword)
     with tab5:
-        st.subheader("Inspect a product")
-        if df.empty:
-            st.info("Run a search first.")
-        else:
-            display = df.apply(lambda r: f"[{int(r['position']) if pd.notna(r['position']) else '-'}] {r['title']}", axis=1)
-            choice = st.selectbox("Pick a product", options=display.tolist())
-            idx = display.tolist().index(choice)
-            pid = df.iloc[idx]["product_id"]
-
-            p2 = st.progress(0); s2 = st.empty()
-            def tick2(el, mx):
-                pct = min(99, int((el/max(1,mx))*100)); p2.progress(pct); s2.info(f"Fetching details… {el}s / {mx}s")
-
-            try:
-                details = client.get_product_info(pid, on_tick=tick2)
-                p2.progress(100); s2.success("Details received")
-            except Exception as e:
-                s2.error(f"Detail fetch failed: {e}")
-                details = None
-
-            def _extract_details(d):
-                items = (((d or {}).get("tasks") or [{}])[0].get("result") or [{}])[0].get("items") or []
-                return items[0] if items else {}
-            item = _extract_details(details)
-
-            show_desc = st.toggle("Show product description", value=False)
-            show_high = st.toggle("Show product highlights/features", value=False)
-            max_imgs = st.slider("Show up to N images", min_value=0, max_value=10, value=4)
-
-            left, right = st.columns([2,1])
-            with left:
-                st.write("Title:", item.get("title") or df.iloc[idx]["title"])
-                st.write("Seller/Domain:", item.get("seller") or item.get("domain") or df.iloc[idx]["domain"])
-                st.write("Price:", item.get("price") or df.iloc[idx]["price"])
-                st.write("Currency:", item.get("currency") or df.iloc[idx]["currency"])
-                st.write("Rating:", (item.get("product_rating") or {}).get("value"))
-                st.write("Reviews:", (item.get("product_rating") or {}).get("votes_count") or item.get("reviews_count"))
-
-            with right:
-                imgs = item.get("product_images") or item.get("images") or []
-                if max_imgs and imgs:
-                    st.image(imgs[:max_imgs], use_column_width=True)
-
-            if show_desc:
-                st.markdown("### Description")
-                st.write(item.get("description") or item.get("product_description") or "—")
-
-            if show_high:
-                st.markdown("### Highlights / Features")
-                feats = item.get("product_highlights") or item.get("highlights") or item.get("features") or []
-                if isinstance(feats, dict):
-                    feats = [f"{k}: {v}" for k,v in feats.items()]
-                if feats:
-                    for f in feats:
-                        st.write("•", f)
-                else:
-                    st.write("—")
-
-            st.markdown("### Raw details (debug)")
-            st.json(details or {})
+        drilldown_tab(df)
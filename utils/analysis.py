@@ -1,13 +1,37 @@
+import re
 from typing import Dict, List
 import pandas as pd
 
-def _safe_price(item):
-    p = item.get("price")
-    if isinstance(p, dict):
-        return p.get("current"), p.get("currency")
-    if isinstance(p, (int, float)):
-        return float(p), item.get("currency")
-    return None, item.get("currency")
+_ACCEPT_TYPES = frozenset({"google_shopping_product", "shopping_product", "product", "google_shopping_serp"})
+_ID_FIELDS = ("product_id", "data_docid", "gid")
+_DOMAIN_RE = re.compile(r"^(?:https?://)?([^/]+)")
+_ATTR_RE = re.compile(r"size|colou?r|cm|mm|inch|ml|l |kg| g", re.IGNORECASE)
+
+def _col(raw: pd.DataFrame, name: str) -> pd.Series:
+    if name in raw:
+        return raw[name]
+    return pd.Series(None, index=raw.index, dtype=object)
+
+def _truthy(col: pd.Series) -> pd.Series:
+    return col.notna() & col.astype(bool)
+
+def _first(raw: pd.DataFrame, *names: str) -> pd.Series:
+    """Column-wise ``a or b or c``: the first truthy value, else the last one."""
+    out = _col(raw, names[-1])
+    for name in reversed(names[:-1]):
+        col = _col(raw, name)
+        out = col.where(_truthy(col), out)
+    return out
+
+def _any(raw: pd.DataFrame, *names: str) -> pd.Series:
+    """True where any of ``names`` is truthy, including dicts flattened to ``name.*`` columns."""
+    out = pd.Series(False, index=raw.index)
+    for name in names:
+        out |= _truthy(_col(raw, name))
+        nested = [c for c in raw.columns if c.startswith(f"{name}.")]
+        if nested:
+            out |= raw[nested].notna().any(axis=1)
+    return out
 
 def parse_shopping_results(api_response: Dict) -> pd.DataFrame:
     if not api_response or "tasks" not in api_response:
@@ -19,58 +43,73 @@ def parse_shopping_results(api_response: Dict) -> pd.DataFrame:
     if not results:
         return pd.DataFrame()
     items = results[0].get("items") or []
-    accept = {"google_shopping_product", "shopping_product", "product", "google_shopping_serp"}
-    out = []
-    for it in items:
-        if it.get("type") not in accept:
-            continue
-        price, currency = _safe_price(it)
-        url = it.get("url") or it.get("shopping_url")
-        pid = it.get("product_id") or it.get("data_docid") or it.get("gid")
-        out.append({
-            "position": it.get("rank_absolute"),
-            "title": it.get("title"),
-            "domain": it.get("domain") or it.get("seller") or it.get("shop_name"),
-            "price": price,
-            "currency": currency,
-            "rating": (it.get("product_rating") or {}).get("value"),
-            "reviews": it.get("votes_count") or it.get("reviews_count"),
-            "product_id": pid,
-            "url": url,
-            "images_count": len(it.get("product_images") or it.get("images") or []),
-            "has_description": bool(it.get("description") or it.get("product_description")),
-            "has_highlights": bool(it.get("product_highlights") or it.get("highlights") or it.get("features")),
-        })
-    df = pd.DataFrame(out)
-    if df.empty:
-        return df
-    df["domain"] = df["domain"].astype(str).str.replace(r"^https?://", "", regex=True).str.split("/").str[0]
+    items = [it for it in items if it.get("type") in _ACCEPT_TYPES]
+    if not items:
+        return pd.DataFrame()
+    # max_level=1 flattens price/product_rating dicts into "price.current", "product_rating.value", ...
+    raw = pd.json_normalize(items, max_level=1)
+    current = _col(raw, "price.current")
+    currency = _col(raw, "price.currency")
+    images = _first(raw, "product_images", "images")
+    # json_normalize turns partly missing int columns into float64 (456 -> 456.0), so the
+    # ID fields are read into an object frame that keeps the original values.
+    ids = pd.DataFrame([{k: it.get(k) for k in _ID_FIELDS} for it in items], dtype=object)
+    df = pd.DataFrame({
+        "position": pd.to_numeric(_col(raw, "rank_absolute"), errors="coerce"),
+        "title": _col(raw, "title"),
+        "domain": _first(raw, "domain", "seller", "shop_name"),
+        "price": pd.to_numeric(current.where(current.notna(), _col(raw, "price")), errors="coerce"),
+        "currency": currency.where(currency.notna(), _col(raw, "currency")),
+        "rating": pd.to_numeric(_col(raw, "product_rating.value"), errors="coerce"),
+        "reviews": pd.to_numeric(_first(raw, "votes_count", "reviews_count"), errors="coerce"),
+        "product_id": _first(ids, *_ID_FIELDS),
+        "url": _first(raw, "url", "shopping_url"),
+        "images_count": pd.to_numeric(images.str.len()).fillna(0).astype(int),
+        "has_description": _any(raw, "description", "product_description"),
+        "has_highlights": _any(raw, "product_highlights", "highlights", "features"),
+    })
+    df = df.astype({c: "string[pyarrow]" for c in ("title", "domain", "currency", "product_id", "url")})
+    df["domain"] = df["domain"].str.extract(_DOMAIN_RE, expand=False)
     if "position" in df:
         df = df.sort_values("position", na_position="last").reset_index(drop=True)
+    df["title_quality"] = title_quality_scores(df["title"])
     return df
 
 def analyze_competitors(df: pd.DataFrame, target_domains: List[str] | None = None) -> Dict:
     if df.empty:
         return {}
+    freq = df["domain"].value_counts()
+    prices = df["price"].agg(["mean", "min", "max"]) if "price" in df and df["price"].notna().any() else None
     analysis = {
         "total_products": int(len(df)),
-        "unique_domains": int(df["domain"].nunique()),
-        "domain_frequency": df["domain"].value_counts().to_dict(),
-        "avg_price": float(df["price"].mean()) if "price" in df and df["price"].notna().any() else None,
+        "unique_domains": int(len(freq)),
+        "domain_frequency": freq.to_dict(),
+        "avg_price": float(prices["mean"]) if prices is not None else None,
         "price_range": {
-            "min": float(df["price"].min()) if "price" in df and df["price"].notna().any() else None,
-            "max": float(df["price"].max()) if "price" in df and df["price"].notna().any() else None
+            "min": float(prices["min"]) if prices is not None else None,
+            "max": float(prices["max"]) if prices is not None else None
         }
     }
     if target_domains:
+        grp = df.groupby(df["domain"].str.lower(), sort=False)
+        g = grp.agg(
+            appearances=("position", "size"),
+            avg_position=("position", "mean"),
+            best_position=("position", "min"),
+        )
+        rows = grp.indices
         td = {}
         for d in target_domains:
-            sub = df[df["domain"].str.lower() == d.lower()]
+            key = d.lower()
+            if key not in g.index:
+                td[d] = {"appearances": 0, "avg_position": None, "best_position": None, "products": []}
+                continue
+            s = g.loc[key]
             td[d] = {
-                "appearances": int(len(sub)),
-                "avg_position": float(sub["position"].mean()) if not sub.empty else None,
-                "best_position": int(sub["position"].min()) if not sub.empty else None,
-                "products": sub.to_dict("records") if not sub.empty else []
+                "appearances": int(s["appearances"]),
+                "avg_position": float(s["avg_position"]) if pd.notna(s["avg_position"]) else None,
+                "best_position": int(s["best_position"]) if pd.notna(s["best_position"]) else None,
+                "products": df.iloc[rows[key]].to_dict("records")
             }
         analysis["target_domains"] = td
     return analysis
@@ -88,8 +127,7 @@ def calculate_title_quality_score(title: str) -> int:
         score += 25
     elif wc >= 5:
         score += 15
-    attrs = ["size", "color", "colour", "cm", "mm", "inch", "ml", "l ", "kg", " g"]
-    if any(k in title.lower() for k in attrs):
+    if _ATTR_RE.search(title):
         score += 20
     caps_ratio = sum(1 for c in title if c.isupper()) / max(1, len(title))
     if caps_ratio < 0.5:
@@ -97,3 +135,22 @@ def calculate_title_quality_score(title: str) -> int:
     if title.split()[0][:1].isupper():
         score += 10
     return min(score, 100)
+
+def title_quality_scores(titles: pd.Series) -> pd.Series:
+    """Column-wise calculate_title_quality_score."""
+    s = titles.astype("string[pyarrow]").fillna("")
+    length = s.str.len()
+    wc = s.str.split().str.len()
+    caps = s.str.count(r"\p{Lu}") / length.clip(lower=1)
+    # Arrow's regex kernel takes the pattern text, not a compiled re.Pattern.
+    has_attr = s.str.contains(_ATTR_RE.pattern, case=False, na=False)
+    first_upper = s.str.lstrip().str[:1].str.isupper()
+    ideal_len = length.between(70, 150)
+    score = (
+        30 * ideal_len + 15 * (~ideal_len & (length >= 50))
+        + 25 * (wc >= 8) + 15 * ((wc >= 5) & (wc < 8))
+        + 20 * has_attr
+        + 15 * (caps < 0.5)
+        + 10 * first_upper
+    )
+    return score.where(length > 0, 0).clip(upper=100).astype("int8")